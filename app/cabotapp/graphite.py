@@ -63,7 +63,7 @@ def parse_metric(metric, mins_to_check=5):
     'num_series_with_data': 0,
     'num_series_no_data': 0,
     'error': None,
-    'all_values': [],
+    'all_values': set(),
     'raw': ''
   }
   try:
@@ -85,6 +85,7 @@ def parse_metric(metric, mins_to_check=5):
     ret['max'] = max(all_values)
     ret['min'] = min(all_values)
     ret['average_value'] = sum(all_values)/len(all_values)
-  ret['all_values'] = all_values
+  # Set for O(1) membership tests in equality checks
+  ret['all_values'] = set(all_values)
   ret['raw'] = data
   return ret
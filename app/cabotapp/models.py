@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from polymorphic import PolymorphicModel
 from django.db.models import F
 from django.contrib.admin.models import User
@@ -10,16 +10,22 @@ from .graphite import parse_metric
 from .alert import send_alert
 from datetime import datetime, timedelta
 from django.utils import timezone
+from django.utils.functional import cached_property
 
 import json
 import re
-import time
 
 import requests
 from celery.utils.log import get_task_logger
 
 logger = get_task_logger(__name__)
 
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Re-alert suppression windows per severity
+WARNING_ALERT_INTERVAL = timedelta(minutes=120)
+ERROR_ALERT_INTERVAL = timedelta(minutes=10)
+
 CHECK_TYPES = (
   ('>', 'Greater than'),
   ('>=', 'Greater than or equal'),
@@ -28,17 +34,26 @@ CHECK_TYPES = (
   ('==', 'Equal to'),
 )
 
+class RawDataEncoder(json.JSONEncoder):
+  """Stringify anything the stock encoder can't handle, so raw_data is
+  always valid JSON for downstream readers."""
+  def default(self, o):
+    return str(o)
+
+
+# Maps check_type to a predicate returning (failed, failure_value)
+CHECK_TYPE_OPS = {
+  '>': lambda series, value: (series['max'] > value, series['max']),
+  '>=': lambda series, value: (series['max'] >= value, series['max']),
+  '<': lambda series, value: (series['min'] < value, series['min']),
+  '<=': lambda series, value: (series['min'] <= value, series['min']),
+  '==': lambda series, value: (value in series['all_values'], value),
+}
+
 def serialize_recent_results(recent_results):
   if not recent_results:
     return ''
-  def result_to_value(result):
-    if result.succeeded:
-      return '1'
-    else:
-      return '-1'
-  vals = [result_to_value(r) for r in recent_results]
-  vals.reverse()
-  return ','.join(vals)
+  return ','.join('1' if r.succeeded else '-1' for r in reversed(recent_results))
 
 def calculate_debounced_passing(recent_results, debounce=0):
   """
@@ -50,6 +65,9 @@ def calculate_debounced_passing(recent_results, debounce=0):
   """
   if not recent_results:
     return True
+  if not debounce:
+    # The common default - pass or fail on the most recent result alone
+    return recent_results[0].succeeded
   debounce_window = recent_results[:debounce+1]
   for r in debounce_window:
     if r.succeeded:
@@ -57,6 +75,28 @@ def calculate_debounced_passing(recent_results, debounce=0):
   return False
 
 
+class ServiceManager(models.Manager):
+
+  def with_check_counts(self):
+    """
+    Annotate each service with the number of active and inactive checks
+    so list pages get all their counts from the one query instead of two
+    COUNT queries per service.
+    """
+    return self.get_query_set().extra(select={
+      'active_checks_count': """
+        SELECT COUNT(*) FROM cabotapp_service_status_checks sc
+        JOIN cabotapp_statuscheck c ON c.id = sc.statuscheck_id
+        WHERE sc.service_id = cabotapp_service.id AND c.active
+      """,
+      'inactive_checks_count': """
+        SELECT COUNT(*) FROM cabotapp_service_status_checks sc
+        JOIN cabotapp_statuscheck c ON c.id = sc.statuscheck_id
+        WHERE sc.service_id = cabotapp_service.id AND NOT c.active
+      """,
+    })
+
+
 class Service(models.Model):
   PASSING_STATUS = 'PASSING'
   WARNING_STATUS = 'WARNING'
@@ -117,6 +157,8 @@ class Service(models.Model):
     help_text='Alphanumeric id of Hackpad containing recovery information.'
   )
 
+  objects = ServiceManager()
+
   class Meta:
     ordering = ['name']
 
@@ -126,23 +168,38 @@ class Service(models.Model):
   def update_status(self):
     self.old_overall_status = self.overall_status
     # Only active checks feed into our calculation
-    status_checks_failed_count = self.all_failing_checks().count()
-    self.overall_status = self.most_severe(self.all_failing_checks())
+    failing_checks = self.all_failing_checks()
+    status_checks_failed_count = failing_checks.count()
+    self.overall_status = self.most_severe(failing_checks)
+    num_checks_active = self.active_status_checks().count()
     self.snapshot = ServiceStatusSnapshot(
       service=self,
-      num_checks_active=self.active_status_checks().count(),
-      num_checks_passing=self.active_status_checks().count()-status_checks_failed_count,
+      num_checks_active=num_checks_active,
+      num_checks_passing=num_checks_active-status_checks_failed_count,
       num_checks_failing=status_checks_failed_count,
       overall_status=self.overall_status,
       time=timezone.now(),
     )
+    # Let alert() mark the snapshot and last_alert_sent before the one
+    # save of each below, rather than re-saving both afterwards. The
+    # actual send happens after the saves so a failing alert channel
+    # can't leave stale status in the database
+    should_alert = False
+    if not (self.overall_status == Service.PASSING_STATUS and self.old_overall_status == Service.PASSING_STATUS):
+      should_alert = self.alert()
     self.snapshot.save()
     self.save()
-    if not (self.overall_status == Service.PASSING_STATUS and self.old_overall_status == Service.PASSING_STATUS):
-      self.alert()
+    if should_alert:
+      # send_alert handles the logic of how exactly alerts should be handled
+      send_alert(self, duty_officers=get_duty_officers())
 
   def most_severe(self, check_list):
-    failures = [c.importance for c in check_list]
+    """
+    Highest importance present in the given checks queryset. The
+    reduction happens in the database - at most 3 distinct importances
+    come back rather than one row per failing check.
+    """
+    failures = set(check_list.order_by().values_list('importance', flat=True).distinct())
     if self.CRITICAL_STATUS in failures:
       return self.CRITICAL_STATUS
     if self.ERROR_STATUS in failures:
@@ -162,31 +219,43 @@ class Service(models.Model):
     return False
 
   def alert(self):
+    """
+    Decide whether an alert should go out, mutating last_alert_sent and
+    the pending snapshot's did_send_alert. Returns True if alerts should
+    be sent - the caller (update_status) persists the fields and fires
+    the send once its own saves are done, so the external channels can't
+    abort the status write.
+    """
     if not self.alerts_enabled:
-      return
+      return False
     if self.overall_status != self.PASSING_STATUS:
+      now = timezone.now()
       # Don't alert every time - only every 10 mins for errors and critical, and 120 mins for warnings
       if self.overall_status == self.WARNING_STATUS:
-        if self.last_alert_sent and (timezone.now() - timedelta(minutes=120)) < self.last_alert_sent:
-          return
+        if self.last_alert_sent and (now - WARNING_ALERT_INTERVAL) < self.last_alert_sent:
+          return False
       elif self.overall_status in (self.CRITICAL_STATUS, self.ERROR_STATUS):
-        if self.last_alert_sent and (timezone.now() - timedelta(minutes=10)) < self.last_alert_sent:
-          return
-      self.last_alert_sent = timezone.now()
+        if self.last_alert_sent and (now - ERROR_ALERT_INTERVAL) < self.last_alert_sent:
+          return False
+      self.last_alert_sent = now
     else:
       self.last_alert_sent = None # We don't count "back to normal" as an alert
-    self.save()
     self.snapshot.did_send_alert = True
-    self.snapshot.save()
-    # send_alert handles the logic of how exactly alerts should be handled
-    send_alert(self, duty_officers=get_duty_officers())
+    return True
 
-  @property
+  @cached_property
   def recent_snapshots(self):
     snapshots = self.snapshots.filter(time__gt=(timezone.now() - timedelta(minutes=60*4)))
-    snapshots = list(snapshots.values())
+    # Only pull the columns the dashboard graph actually plots: the two
+    # check count series plus did_send_alert for the alert event lines
+    snapshots = list(snapshots.values(
+      'time',
+      'num_checks_active',
+      'num_checks_failing',
+      'did_send_alert',
+    ))
     for s in snapshots:
-      s['time'] = time.mktime(s['time'].timetuple())
+      s['time'] = (s['time'] - EPOCH).total_seconds()
     return snapshots
 
   def active_status_checks(self):
@@ -201,23 +270,35 @@ class Service(models.Model):
   def all_failing_checks(self):
     return self.active_status_checks().exclude(calculated_status=self.CALCULATED_PASSING_STATUS)
 
+  @cached_property
+  def _status_checks_by_class(self):
+    """
+    This service's checks partitioned by subclass in a single pass, so
+    pages showing all three check types don't pay a filtered query per
+    type. Reuses the prefetched status_checks cache where one is set up.
+    """
+    by_class = {}
+    for check in self.status_checks.all():
+      by_class.setdefault(check.__class__, []).append(check)
+    return by_class
+
   def graphite_status_checks(self):
-    return self.status_checks.filter(polymorphic_ctype__model='graphitestatuscheck')
+    return self._status_checks_by_class.get(GraphiteStatusCheck, [])
 
   def http_status_checks(self):
-    return self.status_checks.filter(polymorphic_ctype__model='httpstatuscheck')
+    return self._status_checks_by_class.get(HttpStatusCheck, [])
 
   def jenkins_status_checks(self):
-    return self.status_checks.filter(polymorphic_ctype__model='jenkinsstatuscheck')
+    return self._status_checks_by_class.get(JenkinsStatusCheck, [])
 
   def active_graphite_status_checks(self):
-    return self.graphite_status_checks().filter(active=True)
+    return [c for c in self.graphite_status_checks() if c.active]
 
   def active_http_status_checks(self):
-    return self.http_status_checks().filter(active=True)
+    return [c for c in self.http_status_checks() if c.active]
 
   def active_jenkins_status_checks(self):
-    return self.jenkins_status_checks().filter(active=True)
+    return [c for c in self.jenkins_status_checks() if c.active]
 
 
 class ServiceStatusSnapshot(models.Model):
@@ -248,6 +329,7 @@ class StatusCheck(PolymorphicModel):
   name = models.TextField()
   active = models.BooleanField(
     default=True,
+    db_index=True,
     help_text='If not active, check will not be used to calculate service status and will not trigger alerts.',
   )
   importance = models.CharField(
@@ -266,9 +348,17 @@ class StatusCheck(PolymorphicModel):
     help_text='Number of successive failures permitted before check will be marked as failed. Default is 0, i.e. fail on first failure.'
   )
   created_by = models.ForeignKey(User)
-  calculated_status = models.CharField(max_length=50, choices=Service.STATUSES, default=Service.CALCULATED_PASSING_STATUS, blank=True)
+  calculated_status = models.CharField(max_length=50, choices=Service.STATUSES, default=Service.CALCULATED_PASSING_STATUS, blank=True, db_index=True)
   last_run = models.DateTimeField(null=True)
   cached_health = models.TextField(editable=False, null=True)
+  kind = models.CharField(
+    max_length=30,
+    editable=False,
+    blank=True,
+    default='',
+    db_index=True,
+    help_text='Which check subclass this row is. Since the subclasses are proxies over this table, filtering on kind avoids resolving polymorphic_ctype per row.',
+  )
 
   # Graphite checks
   metric = models.TextField(
@@ -328,6 +418,9 @@ class StatusCheck(PolymorphicModel):
     help_text='Alert if build queued for more than this many minutes.',
   )
 
+  # Overridden by each proxy subclass
+  check_kind = ''
+
   class Meta(PolymorphicModel.Meta):
     ordering = ['name']
 
@@ -338,26 +431,89 @@ class StatusCheck(PolymorphicModel):
     return self.statuscheckresult_set.all().order_by('-time_complete')[:10]
 
   def last_result(self):
-    try:
-      return self.recent_results()[0]
-    except:
-      return None
+    results = self.statuscheckresult_set.order_by('-time_complete')[:1]
+    if results:
+      return results[0]
+    return None
 
   def run(self):
     raise NotImplementedError('Subclasses should implement')
 
+  @classmethod
+  def refresh_cached_health_bulk(cls, checks):
+    """
+    Recompute cached_health and calculated_status for many checks at
+    once. Fetches the recent results for all of them with a single
+    time-bounded query rather than one query per check as save() does;
+    checks with nothing inside the window fall back to their own small
+    indexed slice. Writes back with narrow UPDATEs that skip save()'s
+    recalculation query.
+    """
+    checks = list(checks)
+    if not checks:
+      return
+    # Ten results per check span ten runs, so a window of 10x the
+    # slowest frequency (doubled for slack) bounds the scan instead of
+    # streaming every check's full result history
+    max_frequency = max(check.frequency or 5 for check in checks)
+    window_start = timezone.now() - timedelta(minutes=20 * max_frequency)
+    recent_by_check = {}
+    results = StatusCheckResult.objects.filter(
+      check__in=checks,
+      time_complete__gte=window_start,
+    ).order_by('check', '-time_complete').only('check', 'succeeded')
+    for result in results.iterator():
+      recent = recent_by_check.setdefault(result.check_id, [])
+      if len(recent) < 10:
+        recent.append(result)
+    for check in checks:
+      recent = recent_by_check.get(check.id)
+      if recent is None:
+        # Check hasn't run inside the window - take its own slice so a
+        # long-idle check keeps its real history rather than resetting
+        recent = list(check.statuscheckresult_set.only('succeeded').order_by('-time_complete')[:10])
+      if calculate_debounced_passing(recent, check.debounce):
+        check.calculated_status = Service.CALCULATED_PASSING_STATUS
+      else:
+        check.calculated_status = Service.CALCULATED_FAILING_STATUS
+      check.cached_health = serialize_recent_results(recent)
+      cls.objects.filter(id=check.id).update(
+        calculated_status=check.calculated_status,
+        cached_health=check.cached_health,
+      )
+
+  def record_result(self, result):
+    """
+    Save a run's result and this check's bookkeeping fields inside a
+    single transaction, so each run costs one commit round-trip rather
+    than two.
+    """
+    finish = timezone.now()
+    if result.time_complete is None:
+      result.time_complete = finish
+    with transaction.commit_on_success():
+      result.save()
+      self.last_run = finish
+      self.save()
+
   def save(self, *args, **kwargs):
-    recent_results = self.recent_results()
+    # Fetch recent results once and share - both consumers below only
+    # read `succeeded`, so skip the wide raw_data/error columns too
+    recent_results = list(self.statuscheckresult_set.only('succeeded').order_by('-time_complete')[:10])
     if calculate_debounced_passing(recent_results, self.debounce):
       self.calculated_status = Service.CALCULATED_PASSING_STATUS
     else:
       self.calculated_status = Service.CALCULATED_FAILING_STATUS
     self.cached_health = serialize_recent_results(recent_results)
+    if not self.kind:
+      self.kind = self.check_kind
     super(StatusCheck, self).save(*args, **kwargs)
 
 
 class GraphiteStatusCheck(StatusCheck):
 
+  check_kind = 'graphite'
+
   class Meta(StatusCheck.Meta):
     proxy = True
 
@@ -400,36 +556,18 @@ class GraphiteStatusCheck(StatusCheck):
     )
     if series['num_series_with_data'] > 0:
       result.average_value = series['average_value']
-      if self.check_type == '<':
-        failed = float(series['min']) < float(self.value)
-        if failed:
-          failure_value = series['min']
-      elif self.check_type == '<=':
-        failed = float(series['min']) <= float(self.value)
-        if failed:
-          failure_value = series['min']
-      elif self.check_type == '>':
-        failed = float(series['max']) > float(self.value)
-        if failed:
-          failure_value = series['max']
-      elif self.check_type == '>=':
-        failed = float(series['max']) >= float(self.value)
-        if failed:
-          failure_value = series['max']
-      elif self.check_type == '==':
-        failed = float(self.value) in series['all_values']
-        if failed:
-          failure_value = float(self.value)
-      else:
+      try:
+        check_op = CHECK_TYPE_OPS[self.check_type]
+      except KeyError:
         raise Exception('Check type %s not supported' % self.check_type)
+      failed, value_checked = check_op(series, float(self.value))
+      if failed:
+        failure_value = value_checked
 
     if series['num_series_with_data'] < self.expected_num_hosts:
       failed = True
 
-    try:
-      result.raw_data = json.dumps(series['raw'])
-    except:
-      result.raw_data = series['raw']
+    result.raw_data = json.dumps(series['raw'], cls=RawDataEncoder, separators=(',', ':'))
     result.succeeded = not failed
     if not result.succeeded:
       result.error = self.format_error_message(
@@ -439,14 +577,13 @@ class GraphiteStatusCheck(StatusCheck):
 
     result.actual_hosts = series['num_series_with_data']
     result.failure_value = failure_value
-    result.save()
-
-    self.last_run = finish
-    super(GraphiteStatusCheck, self).save()
+    self.record_result(result)
 
 
 class HttpStatusCheck(StatusCheck):
 
+  check_kind = 'http'
+
   class Meta(StatusCheck.Meta):
     proxy = True
 
@@ -454,6 +591,33 @@ class HttpStatusCheck(StatusCheck):
   def check_category(self):
     return "HTTP check"
 
+  # Never buffer more than this much of a response body
+  MAX_RAW_BYTES = 1024 * 1024
+
+  @cached_property
+  def compiled_text_match(self):
+    return re.compile(self.text_match)
+
+  def _read_body(self, resp, match=None):
+    """
+    Stream the response body up to MAX_RAW_BYTES, returning
+    (matched, body read so far). Stops reading as soon as `match` is
+    found so we don't pull the rest of a large body off the wire.
+    """
+    body = bytearray()
+    for chunk in resp.iter_content(8192):
+      body.extend(chunk)
+      if match is not None and match.search(body):
+        return True, str(body)
+      if len(body) >= self.MAX_RAW_BYTES:
+        break
+    return False, str(body)
+
+  def save(self, *args, **kwargs):
+    # text_match may have changed - drop the memoized pattern
+    self.__dict__.pop('compiled_text_match', None)
+    return super(HttpStatusCheck, self).save(*args, **kwargs)
+
   def run(self):
     start = timezone.now()
     result = StatusCheckResult(check=self, time=start)
@@ -463,7 +627,8 @@ class HttpStatusCheck(StatusCheck):
         self.endpoint,
         timeout=self.timeout,
         verify=True,
-        auth=auth
+        auth=auth,
+        prefetch=False,
       )
     except requests.RequestException, exc:
       result.error = 'Request error occurred: %s' % (exc,)
@@ -472,26 +637,25 @@ class HttpStatusCheck(StatusCheck):
       if self.status_code and resp.status_code != int(self.status_code):
         result.error = 'Wrong code: got %s (expected %s)' % (resp.status_code, int(self.status_code))
         result.succeeded = False
-        result.raw_data = resp.content
+        _, result.raw_data = self._read_body(resp)
       elif self.text_match:
-        if not re.search(self.text_match, resp.content):
+        matched, body = self._read_body(resp, match=self.compiled_text_match)
+        if not matched:
           result.error = 'Failed to find match regex [%s] in response body' % self.text_match
-          result.raw_data = resp.content
+          result.raw_data = body
           result.succeeded = False
         else:
           result.succeeded = True
       else:
         result.succeeded = True
 
-    finish = timezone.now()
-    result.time_complete = finish
-    result.save()
-    self.last_run = finish
-    super(HttpStatusCheck, self).save()
+    self.record_result(result)
 
 
 class JenkinsStatusCheck(StatusCheck):
 
+  check_kind = 'jenkins'
+
   class Meta(StatusCheck.Meta):
     proxy = True
 
@@ -516,23 +680,15 @@ class JenkinsStatusCheck(StatusCheck):
       # Fail if there's a 404 - the job is misconfigured probably
       result.error = 'Job %s not found on Jenkins' % self.name
       result.succeeded = False
-      finish = timezone.now()
-      result.time_complete = finish
-      result.save()
-      self.last_run = finish
-      super(JenkinsStatusCheck, self).save()
+      self.record_result(result)
       return
     except:
       # If something else goes wrong, we will *not* fail - otherwise
       # a lot of services seem to fail all at once.
       # Ugly to do it here but...
-      finish = timezone.now()
       result.error = 'Error fetching from Jenkins'
       result.succeeded = True
-      result.time_complete = finish
-      result.save()
-      self.last_run = finish
-      super(JenkinsStatusCheck, self).save()
+      self.record_result(result)
       return
     if not active:
       # We will fail if the job has been disabled
@@ -558,11 +714,7 @@ class JenkinsStatusCheck(StatusCheck):
           result.error = 'Job "%s" failing on Jenkins' % self.name
         result.raw_data = status
 
-    finish = timezone.now()
-    result.time_complete = finish
-    result.save()
-    self.last_run = finish
-    super(JenkinsStatusCheck, self).save()
+    self.record_result(result)
 
 
 class StatusCheckResult(models.Model):
@@ -630,8 +782,8 @@ class UserProfile(models.Model):
 
 
 class Shift(models.Model):
-  start = models.DateTimeField()
-  end = models.DateTimeField()
+  start = models.DateTimeField(db_index=True)
+  end = models.DateTimeField(db_index=True)
   user = models.ForeignKey(User)
   uid = models.TextField()
   deleted = models.BooleanField(default=False)
@@ -652,7 +804,7 @@ def get_duty_officers(at_time=None):
     deleted=False,
     start__lt=at_time,
     end__gt=at_time,
-  )
+  ).select_related('user')
   if current_shifts:
     duty_officers = [shift.user for shift in current_shifts]
     return duty_officers
@@ -673,16 +825,26 @@ def update_shifts():
   future_shifts = Shift.objects.filter(start__gt=timezone.now())
   future_shifts.update(deleted=True)
 
+  # Load all shifts for these events up front rather than one get() per event
+  existing_shifts = {}
+  for s in Shift.objects.filter(uid__in=[event['uid'] for event in events]):
+    existing_shifts[s.uid] = s
+
+  new_shifts = []
   for event in events:
     e = event['summary'].lower().strip()
     if e in user_lookup:
       user = user_lookup[e]
-      try:
-        s = Shift.objects.get(uid=event['uid'])
-      except Shift.DoesNotExist:
+      s = existing_shifts.get(event['uid'])
+      if s is None:
         s = Shift(uid=event['uid'])
       s.start = event['start']
       s.end = event['end']
       s.user = user
       s.deleted = False
-      s.save()
+      if s.pk:
+        s.save()
+      else:
+        new_shifts.append(s)
+  if new_shifts:
+    Shift.objects.bulk_create(new_shifts)
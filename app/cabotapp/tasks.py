@@ -46,7 +46,8 @@ def run_status_check(check_or_id):
 def run_all_checks():
   from .models import StatusCheck
   from datetime import timedelta, datetime
-  checks = StatusCheck.objects.all()
+  # Scheduling only reads base fields, skip the per-row subclass resolution
+  checks = StatusCheck.objects.all().non_polymorphic()
   seconds = range(60)
   for check in checks:
     if check.last_run:
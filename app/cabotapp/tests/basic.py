@@ -40,12 +40,14 @@ def fake_jenkins_response(*args, **kwargs):
 def fake_http_200_response(*args, **kwargs):
   resp = Mock()
   resp.content = get_content('http_response.html')
+  resp.iter_content = lambda chunk_size: iter([resp.content])
   resp.status_code = 200
   return resp
 
 def fake_http_404_response(*args, **kwargs):
   resp = Mock()
   resp.content = get_content('http_response.html')
+  resp.iter_content = lambda chunk_size: iter([resp.content])
   resp.status_code = 404
   return resp
 
@@ -128,6 +130,24 @@ class TestCheckRun(LocalTestCase):
     self.service.update_status()
     self.assertEqual(self.service.overall_status, Service.PASSING_STATUS)
 
+  def test_refresh_cached_health_bulk(self):
+    StatusCheck.refresh_cached_health_bulk([self.graphite_check, self.http_check])
+    graphite_check = StatusCheck.objects.get(id=self.graphite_check.id)
+    self.assertEqual(graphite_check.cached_health, '-1,1')
+    self.assertEqual(graphite_check.calculated_status, Service.CALCULATED_PASSING_STATUS)
+    http_check = StatusCheck.objects.get(id=self.http_check.id)
+    self.assertEqual(http_check.cached_health, '')
+
+  def test_check_counts_annotation(self):
+    service = Service.objects.with_check_counts().get(id=self.service.id)
+    self.assertEqual(service.active_checks_count, 3)
+    self.assertEqual(service.inactive_checks_count, 0)
+    self.http_check.active = False
+    self.http_check.save()
+    service = Service.objects.with_check_counts().get(id=self.service.id)
+    self.assertEqual(service.active_checks_count, 2)
+    self.assertEqual(service.inactive_checks_count, 1)
+
   @patch('cabotapp.graphite.requests.get', fake_graphite_response)
   def test_graphite_run(self):
     checkresults = self.graphite_check.statuscheckresult_set.all()
@@ -289,7 +289,9 @@ class StatusCheckListView(LoginRequiredMixin, ListView):
   context_object_name = 'checks'
 
   def get_queryset(self):
-    return StatusCheck.objects.all().order_by('name').prefetch_related('service_set')
+    # The list template only touches base fields and `kind`, so skip
+    # polymorphic's per-row subclass resolution
+    return StatusCheck.objects.all().non_polymorphic().order_by('name').prefetch_related('service_set')
 
 
 class StatusCheckDeleteView(LoginRequiredMixin, DeleteView):
@@ -331,7 +333,7 @@ class ServiceListView(LoginRequiredMixin, ListView):
   context_object_name = 'services'
 
   def get_queryset(self):
-    return Service.objects.all().order_by('name').prefetch_related('status_checks')
+    return Service.objects.with_check_counts().order_by('name').prefetch_related('status_checks')
 
 
 class ServiceDetailView(LoginRequiredMixin, DetailView):